@@ -1,30 +1,69 @@
 //! BM25 中文文本搜索算法 Rust 实现
 //!
-//! 使用 jieba-rs 进行中文分词，基于倒排索引和 Block-Max WAND 算法实现高效检索
+//! 使用 jieba-rs 进行中文分词，基于倒排索引和 MaxScore 剪枝算法实现高效检索
 //! 支持索引持久化
 
 use jieba_rs::Jieba;
+use numpy::ndarray::Array2;
+use numpy::{IntoPyArray, PyArray1, PyArray2};
 use pyo3::prelude::*;
+use rayon::prelude::*;
+use rustc_hash::FxHashMap;
 use serde::{Deserialize, Serialize};
-use std::collections::{BinaryHeap, HashMap};
+use std::collections::{BinaryHeap, HashMap, VecDeque};
 use std::fs::File;
-use std::io::{BufReader, BufWriter};
-use std::sync::LazyLock;
+use std::io::{BufWriter, Write};
+use std::sync::{Arc, LazyLock, RwLock};
 
 /// 全局 Jieba 实例（线程安全，延迟初始化）
 static JIEBA: LazyLock<Jieba> = LazyLock::new(Jieba::new);
 
 /// 常量定义
 const BLOCK_SIZE: usize = 128; // BMW 算法块大小
-
-/// 倒排索引块
+const QUERY_CACHE_CAPACITY: usize = 4096; // 查询分词缓存的最大条目数
+const INDEX_MAGIC: &[u8; 8] = b"BM25JIEB"; // 索引文件头魔数
+const INDEX_FORMAT_VERSION: u32 = 2; // 索引文件格式版本 (紧跟魔数，小端 u32)，格式不兼容时递增
+const BOUND_SLACK: f64 = 1.0 + 1e-9; // 剪枝比较时对整个上界的放大系数，见 below_threshold
+
+/// 倒排索引块 (SoA 布局：文档ID与词频分别连续存放)
+///
+/// 文档长度不再随每条倒排记录重复存储，打分时按 doc_id 从全局 doc_lengths 取。
+/// 文档ID按差值 + varbyte 压缩存放，首个差值相对于上一块的 last_doc_id，使用前整块解码。
+/// impacts 为预先算好的每个文档在该词上的 BM25 得分 (即稀疏矩阵 W[t, d])，查询时只需查表累加
 #[derive(Debug, Serialize, Deserialize)]
 struct Block {
-    max_score: f64,     // 块内最大可能得分 (BMW 优化核心)
-    last_doc_id: u32,   // 块内最后一个文档ID (Skip List)
-    doc_ids: Vec<u32>,  // 文档ID列表
-    freqs: Vec<u32>,    // 词频列表
-    doc_lens: Vec<u32>, // 文档长度列表 (用于计算 BM25)
+    last_doc_id: u32, // 块内最后一个文档ID (Skip List)
+    #[serde(with = "serde_bytes")]
+    doc_id_deltas: Vec<u8>, // varbyte 编码的文档ID差值 (按原始字节串存储)
+    freqs: Vec<u32>,  // 词频列表，长度即块内文档数
+    #[serde(skip)]
+    impacts: Vec<f32>, // 块内各文档的 BM25 得分 (f32 存储，累加时转为 f64)，fit/load 后重建
+}
+
+impl Block {
+    fn len(&self) -> usize {
+        self.freqs.len()
+    }
+
+    /// 解码块内文档ID (差值前缀和)，base 为上一块的 last_doc_id (首块为 0)，返回块内文档数
+    fn decode_doc_ids(&self, base: u32, out: &mut [u32; BLOCK_SIZE]) -> usize {
+        let mut doc_id = base;
+        let mut bytes = self.doc_id_deltas.iter();
+        for slot in out[..self.len()].iter_mut() {
+            let mut delta = 0u32;
+            let mut shift = 0;
+            for &byte in bytes.by_ref() {
+                delta |= ((byte & 0x7F) as u32) << shift;
+                if byte & 0x80 == 0 {
+                    break;
+                }
+                shift += 7;
+            }
+            doc_id += delta;
+            *slot = doc_id;
+        }
+        self.len()
+    }
 }
 
 /// 倒排列表
@@ -32,6 +71,50 @@ struct Block {
 struct InvertedList {
     blocks: Vec<Block>,
     doc_count: usize, // 包含该词的文档总数
+    #[serde(skip)]
+    term_weight: f64, // 词项权重 idf * (k1 + 1)，fit/load 后重建
+    #[serde(skip)]
+    max_score: f64, // 该词在所有文档上的最大得分 (MaxScore 剪枝上界)，fit/load 后重建
+}
+
+impl InvertedList {
+    /// 解码第 block_idx 块的文档ID，返回块内文档数
+    fn decode_block(&self, block_idx: usize, out: &mut [u32; BLOCK_SIZE]) -> usize {
+        let base = match block_idx {
+            0 => 0,
+            _ => self.blocks[block_idx - 1].last_doc_id,
+        };
+        self.blocks[block_idx].decode_doc_ids(base, out)
+    }
+}
+
+/// 查询分词结果缓存 (容量固定，先进先出淘汰)
+///
+/// 分词结果只取决于查询文本和 lowercase 配置，与索引内容无关，重新 fit 后依然有效。
+/// 由 RwLock 保护：命中只需读锁，可被多个查询线程同时读取；只有写回新结果时才加写锁
+#[derive(Default)]
+struct QueryCache {
+    entries: HashMap<String, Arc<[String]>>,
+    order: VecDeque<String>,
+}
+
+impl QueryCache {
+    fn get(&self, query: &str) -> Option<Arc<[String]>> {
+        self.entries.get(query).cloned()
+    }
+
+    fn insert(&mut self, query: &str, tokens: Arc<[String]>) {
+        if self.entries.contains_key(query) {
+            return;
+        }
+        if self.order.len() >= QUERY_CACHE_CAPACITY {
+            if let Some(oldest) = self.order.pop_front() {
+                self.entries.remove(&oldest);
+            }
+        }
+        self.order.push_back(query.to_string());
+        self.entries.insert(query.to_string(), tokens);
+    }
 }
 
 /// 候选文档得分（用于 Top-K 堆）
@@ -45,7 +128,8 @@ struct ScoredDoc {
 impl Eq for ScoredDoc {}
 impl PartialOrd for ScoredDoc {
     fn partial_cmp(&self, other: &Self) -> Option<std::cmp::Ordering> {
-        other.score.partial_cmp(&self.score)
+        // BinaryHeap 通过 PartialOrd 比较，必须与 Ord 一致，否则同分文档的先后顺序不确定
+        Some(self.cmp(other))
     }
 }
 impl Ord for ScoredDoc {
@@ -60,7 +144,57 @@ impl Ord for ScoredDoc {
     }
 }
 
+/// 容量为 k 的 Top-K 收集器 (最小堆)，整体复杂度 O(N log k)
+struct TopK {
+    k: usize,
+    heap: BinaryHeap<ScoredDoc>,
+}
+
+impl TopK {
+    fn new(k: usize, corpus_size: usize) -> Self {
+        TopK {
+            k,
+            heap: BinaryHeap::with_capacity(k.min(corpus_size)),
+        }
+    }
+
+    fn is_full(&self) -> bool {
+        self.heap.len() >= self.k
+    }
+
+    /// 进入 Top-K 需要超过的分数 (堆未满时为负无穷)
+    fn threshold(&self) -> f64 {
+        match self.heap.peek() {
+            Some(min_node) if self.is_full() => min_node.score,
+            _ => f64::NEG_INFINITY,
+        }
+    }
+
+    /// 尝试插入文档，返回是否进入了 Top-K
+    fn push(&mut self, score: f64, doc_id: u32) -> bool {
+        if !self.is_full() {
+            self.heap.push(ScoredDoc { score, doc_id });
+            return true;
+        }
+        match self.heap.peek_mut() {
+            // 直接替换堆顶 (只做一次下沉)，代替 pop + push
+            Some(mut min_node) if score > min_node.score => {
+                *min_node = ScoredDoc { score, doc_id };
+                true
+            }
+            _ => false,
+        }
+    }
+
+    /// 按分数降序返回结果
+    fn into_sorted_vec(self) -> Vec<ScoredDoc> {
+        self.heap.into_sorted_vec()
+    }
+}
+
 /// BM25 中文文本搜索算法
+///
+/// 查询方法均只读 (&self) 且计算期间释放 GIL，同一实例可在多个线程间共享并发查询
 #[pyclass]
 #[derive(Serialize, Deserialize)]
 pub struct BM25 {
@@ -69,9 +203,12 @@ pub struct BM25 {
     lowercase: bool,
     corpus_size: usize,
     avgdl: f64,
-    index: HashMap<String, InvertedList>,
-    doc_lengths: Vec<u32>, // 全局文档长度
-    doc_ids: Vec<u64>,     // 映射: 内部ID(usize) -> 外部ID(u64)
+    vocab: FxHashMap<Box<str>, u32>, // 词典: 词 -> 词 ID
+    postings: Vec<InvertedList>,     // 倒排列表，按词 ID 下标访问
+    doc_lengths: Vec<u32>,           // 全局文档长度 (精确值，构建 impacts 时计算长度归一化因子)
+    doc_ids: Vec<u64>,               // 映射: 内部ID(usize) -> 外部ID(u64)
+    #[serde(skip)]
+    query_cache: RwLock<QueryCache>, // 查询分词缓存，不参与序列化
 }
 
 #[pymethods]
@@ -86,9 +223,11 @@ impl BM25 {
             lowercase,
             corpus_size: 0,
             avgdl: 0.0,
-            index: HashMap::new(),
+            vocab: FxHashMap::default(),
+            postings: Vec::new(),
             doc_lengths: Vec::new(),
             doc_ids: Vec::new(),
+            query_cache: RwLock::default(),
         }
     }
 
@@ -107,7 +246,8 @@ impl BM25 {
         }
 
         self.corpus_size = documents.len();
-        self.index.clear();
+        self.vocab.clear();
+        self.postings.clear();
         self.doc_lengths.clear();
         self.doc_ids.clear();
 
@@ -118,28 +258,35 @@ impl BM25 {
             self.doc_ids = (0..self.corpus_size as u64).collect();
         }
 
-        let mut temp_index: HashMap<String, Vec<(u32, u32, u32)>> = HashMap::new();
-        let mut total_length: u64 = 0;
+        // 1. 并行分词并统计每个文档的词频
+        let doc_terms: Vec<(u32, FxHashMap<String, u32>)> = documents
+            .par_iter()
+            .map(|doc| {
+                let tokens = self.tokenize(doc);
+                let doc_len = tokens.len() as u32;
 
-        // 1. 分词并收集 Postings
-        for (doc_id, doc) in documents.iter().enumerate() {
-            let doc_id = doc_id as u32;
-            let tokens = self.tokenize(doc);
-            let doc_len = tokens.len() as u32;
+                let mut freq_map: FxHashMap<String, u32> = FxHashMap::default();
+                for token in tokens {
+                    *freq_map.entry(token).or_insert(0) += 1;
+                }
+                (doc_len, freq_map)
+            })
+            .collect();
+
+        // 2. 按文档顺序合并 Postings (doc_id 递增，无需再排序)，同时为每个词分配 ID
+        let mut temp_postings: Vec<Vec<(u32, u32)>> = Vec::new();
+        let mut total_length: u64 = 0;
 
+        for (doc_id, (doc_len, freq_map)) in doc_terms.into_iter().enumerate() {
             self.doc_lengths.push(doc_len);
             total_length += doc_len as u64;
 
-            let mut freq_map: HashMap<String, u32> = HashMap::new();
-            for token in tokens {
-                *freq_map.entry(token).or_insert(0) += 1;
-            }
-
             for (term, freq) in freq_map {
-                temp_index
-                    .entry(term)
-                    .or_default()
-                    .push((doc_id, freq, doc_len));
+                let term_id = *self.vocab.entry(term.into_boxed_str()).or_insert_with(|| {
+                    temp_postings.push(Vec::new());
+                    (temp_postings.len() - 1) as u32
+                });
+                temp_postings[term_id as usize].push((doc_id as u32, freq));
             }
         }
 
@@ -149,129 +296,198 @@ impl BM25 {
             0.0
         };
 
-        // 2. 构建 Block-Max 倒排索引
-        for (term, mut postings) in temp_index {
-            postings.sort_by_key(|k| k.0); // 按 doc_id 排序
-
-            let mut inverted_list = InvertedList {
-                doc_count: postings.len(),
-                blocks: Vec::new(),
-            };
+        // 3. 并行构建 Block-Max 倒排索引
+        self.postings = temp_postings
+            .par_iter()
+            .map(|postings| self.build_inverted_list(postings))
+            .collect();
+        Ok(())
+    }
 
-            for chunk in postings.chunks(BLOCK_SIZE) {
-                let mut block = Block {
-                    max_score: 0.0,
-                    last_doc_id: chunk.last().unwrap().0,
-                    doc_ids: Vec::with_capacity(chunk.len()),
-                    freqs: Vec::with_capacity(chunk.len()),
-                    doc_lens: Vec::with_capacity(chunk.len()),
-                };
+    /// 搜索与查询最相关的文档 (MaxScore 动态剪枝)
+    /// 返回: List[(doc_id, score)]，其中 doc_id 是外部 ID (u64)
+    #[pyo3(signature = (query, top_k=None))]
+    pub fn search(&self, py: Python<'_>, query: &str, top_k: Option<usize>) -> Vec<(u64, f64)> {
+        py.detach(|| {
+            // 必然没有结果时不分词，也不写入查询缓存
+            if self.is_empty_search(top_k) {
+                return Vec::new();
+            }
+            self.search_top_k(&self.tokenize_query(query), top_k)
+        })
+    }
 
-                let idf = self.calc_idf(postings.len());
+    /// 批量搜索，一次调用处理多个查询
+    /// 返回: List[List[(doc_id, score)]]，顺序与 queries 一致
+    #[pyo3(signature = (queries, top_k=None))]
+    pub fn search_batch(
+        &self,
+        py: Python<'_>,
+        queries: Vec<String>,
+        top_k: Option<usize>,
+    ) -> Vec<Vec<(u64, f64)>> {
+        // 查询之间互不依赖：释放 GIL 后先批量分词，再用 rayon 并行检索
+        py.detach(|| {
+            if self.is_empty_search(top_k) {
+                return vec![Vec::new(); queries.len()];
+            }
+            self.tokenize_queries(&queries)
+                .par_iter()
+                .map(|query_tokens| self.search_top_k(query_tokens, top_k))
+                .collect()
+        })
+    }
 
-                for &(doc_id, freq, doc_len) in chunk {
-                    block.doc_ids.push(doc_id);
-                    block.freqs.push(freq);
-                    block.doc_lens.push(doc_len);
+    /// 获取所有文档的 BM25 分数
+    /// 返回: numpy.ndarray[float64]，形状为 (文档数,)
+    pub fn get_scores<'py>(&self, py: Python<'py>, query: &str) -> Bound<'py, PyArray1<f64>> {
+        let scores = py.detach(|| {
+            let query_tokens = [self.tokenize_query(query)];
+            let mut scores = vec![0.0; self.corpus_size];
+            self.score_queries(&query_tokens, &mut scores);
+            scores
+        });
+        scores.into_pyarray(py)
+    }
 
-                    // 计算该文档的 BM25 分数，更新 Block Max Score
-                    let score = self.calc_bm25_score(idf, freq, doc_len);
-                    if score > block.max_score {
-                        block.max_score = score;
-                    }
-                }
-                inverted_list.blocks.push(block);
-            }
+    /// 批量获取所有文档的 BM25 分数
+    /// 返回: numpy.ndarray[float64]，形状为 (len(queries), 文档数)
+    pub fn get_scores_batch<'py>(
+        &self,
+        py: Python<'py>,
+        queries: Vec<String>,
+    ) -> PyResult<Bound<'py, PyArray2<f64>>> {
+        let scores = py.detach(|| self.score_batch(&queries));
+        let scores = Array2::from_shape_vec((queries.len(), self.corpus_size), scores)
+            .map_err(|e| PyErr::new::<pyo3::exceptions::PyValueError, _>(e.to_string()))?;
+        Ok(scores.into_pyarray(py))
+    }
 
-            self.index.insert(term, inverted_list);
-        }
+    /// 保存索引到文件 (文件头 + MessagePack)
+    pub fn save(&self, path: &str) -> PyResult<()> {
+        let file = File::create(path)?;
+        let mut writer = BufWriter::new(file);
+        writer.write_all(INDEX_MAGIC)?;
+        writer.write_all(&INDEX_FORMAT_VERSION.to_le_bytes())?;
+        rmp_serde::encode::write(&mut writer, self)
+            .map_err(|e| PyErr::new::<pyo3::exceptions::PyIOError, _>(e.to_string()))?;
+        writer.flush()?;
         Ok(())
     }
 
-    /// 搜索与查询最相关的文档 (Block-Max WAND)
-    /// 返回: List[(doc_id, score)]，其中 doc_id 是外部 ID (u64)
-    #[pyo3(signature = (query, top_k=None))]
-    pub fn search(&self, query: &str, top_k: Option<usize>) -> Vec<(u64, f64)> {
-        let k = top_k.unwrap_or(10); // 默认 Top 10
-        let query_tokens = self.tokenize(query);
-        let mut heap = BinaryHeap::new(); // 最小堆，保存 Top-K
-
-        // 收集所有相关词的 Block 迭代器
-        let mut cursors: Vec<BlockCursor> = Vec::new();
-        for token in query_tokens {
-            if let Some(inv_list) = self.index.get(&token) {
-                if !inv_list.blocks.is_empty() {
-                    let idf = self.calc_idf(inv_list.doc_count);
-                    cursors.push(BlockCursor::new(inv_list, idf));
-                }
-            }
-        }
+    /// 从文件加载索引 (文件头 + MessagePack)
+    #[staticmethod]
+    pub fn load(path: &str) -> PyResult<Self> {
+        // 一次读入整个文件，再直接在字节切片上解析
+        let bytes = std::fs::read(path)?;
+        let mut bm25: BM25 = rmp_serde::from_slice(strip_index_header(&bytes)?)
+            .map_err(|e| PyErr::new::<pyo3::exceptions::PyIOError, _>(e.to_string()))?;
+        bm25.build_caches();
+        Ok(bm25)
+    }
+}
 
-        if cursors.is_empty() {
+impl BM25 {
+    /// top_k 为 0 或索引为空时任何查询都没有结果，调用方应在分词之前检查
+    fn is_empty_search(&self, top_k: Option<usize>) -> bool {
+        top_k == Some(0) || self.corpus_size == 0
+    }
+
+    /// 按已分词的查询搜索最相关的 top_k 个文档 (MaxScore 动态剪枝)，不需要持有 GIL
+    ///
+    /// 只读访问索引，堆与游标等可变状态均为本次调用的局部变量，可在多个线程中并发调用
+    fn search_top_k(&self, query_tokens: &[String], top_k: Option<usize>) -> Vec<(u64, f64)> {
+        if self.is_empty_search(top_k) {
             return Vec::new();
         }
+        let k = top_k.unwrap_or(10); // 默认 Top 10
 
-        // 简化的 BMW/WAND 逻辑
-        let mut active_cursors: Vec<&mut BlockCursor> = cursors.iter_mut().collect();
-
-        loop {
-            // 1. 找出当前所有 cursor 中最小的 doc_id
-            let mut min_doc_id = u32::MAX;
-            let mut all_finished = true;
-
-            for cursor in &active_cursors {
-                if let Some(doc_id) = cursor.curr_doc_id() {
-                    all_finished = false;
-                    if doc_id < min_doc_id {
-                        min_doc_id = doc_id;
-                    }
-                }
-            }
+        // 收集所有相关词的 Block 迭代器 (重复的查询词合并为一个，按 qf 加权)
+        // slot 为词项按词 ID 排序后的位置，最终得分按 slot 顺序累加，与 get_scores 逐位一致
+        let mut cursors: Vec<BlockCursor> = self
+            .query_terms(query_tokens)
+            .into_iter()
+            .filter(|term| !term.list.blocks.is_empty())
+            .enumerate()
+            .map(|(slot, term)| BlockCursor::new(term.list, term.qf, slot))
+            .collect();
 
-            if all_finished {
+        // 空查询或查询词全部不在词典中：直接返回，不进入打分流程
+        if cursors.is_empty() {
+            return Vec::new();
+        }
+        let mut top_docs = TopK::new(k, self.corpus_size);
+
+        // MaxScore：按词项得分上界升序排列，prefix_bounds[i] 为前 i+1 个词的上界之和
+        cursors.sort_by(|a, b| a.upper_bound().total_cmp(&b.upper_bound()));
+        let prefix_bounds: Vec<f64> = cursors
+            .iter()
+            .scan(0.0, |acc, cursor| {
+                *acc += cursor.upper_bound();
+                Some(*acc)
+            })
+            .collect();
+        let mut contributions = vec![0.0; cursors.len()];
+
+        // cursors[..first_essential] 为非必要词：仅靠它们无法进入 Top-K，不用于产生候选文档
+        let mut first_essential = 0;
+        let mut threshold = top_docs.threshold();
+
+        while first_essential < cursors.len() {
+            // 1. 在必要词中找出最小的 doc_id 作为候选
+            let Some(candidate) = cursors[first_essential..]
+                .iter()
+                .filter_map(|cursor| cursor.curr_doc_id())
+                .min()
+            else {
                 break;
-            }
-
-            // 2. 剪枝检查
-            // TODO: WAND threshold check
+            };
 
-            // 3. 计算 min_doc_id 的准确分数
+            // 2. 累加必要词的得分 (score 仅用于剪枝，各词得分另记入 contributions)
+            contributions.fill(0.0);
             let mut score = 0.0;
-            let mut advanced_any = false;
-
-            for cursor in &mut active_cursors {
-                if let Some(doc_id) = cursor.curr_doc_id() {
-                    if doc_id == min_doc_id {
-                        score += cursor.curr_score(self.k1, self.b, self.avgdl);
-                        cursor.advance();
-                        advanced_any = true;
-                    }
+            for cursor in &mut cursors[first_essential..] {
+                if cursor.curr_doc_id() == Some(candidate) {
+                    let term_score = cursor.curr_score();
+                    contributions[cursor.slot] = term_score;
+                    score += term_score;
+                    cursor.advance();
                 }
             }
 
-            if !advanced_any {
-                break;
+            // 3. 按上界从大到小补充非必要词的得分，上界不足以超过阈值时提前放弃
+            let mut pruned = false;
+            for i in (0..first_essential).rev() {
+                if below_threshold(score + prefix_bounds[i], threshold) {
+                    pruned = true;
+                    break;
+                }
+                let cursor = &mut cursors[i];
+                cursor.advance_to(candidate);
+                if cursor.curr_doc_id() == Some(candidate) {
+                    let term_score = cursor.curr_score();
+                    contributions[cursor.slot] = term_score;
+                    score += term_score;
+                }
+            }
+            if pruned {
+                continue;
             }
 
-            // 4. 更新堆
-            if heap.len() < k {
-                heap.push(ScoredDoc {
-                    score,
-                    doc_id: min_doc_id,
-                });
-            } else if let Some(min_node) = heap.peek() {
-                if score > min_node.score {
-                    heap.pop();
-                    heap.push(ScoredDoc {
-                        score,
-                        doc_id: min_doc_id,
-                    });
+            // 4. 按词 ID 顺序重新累加得到最终得分，再更新堆；阈值提高后把上界之和不超过阈值的词移入非必要词
+            let score = contributions.iter().fold(0.0, |acc, &s| acc + s);
+            if top_docs.push(score, candidate) && top_docs.is_full() {
+                threshold = top_docs.threshold();
+                while first_essential < cursors.len()
+                    && below_threshold(prefix_bounds[first_essential], threshold)
+                {
+                    first_essential += 1;
                 }
             }
         }
 
         // 结果排序 (分数降序)
-        let results: Vec<(u64, f64)> = heap
+        let results: Vec<(u64, f64)> = top_docs
             .into_sorted_vec()
             .into_iter()
             .map(|d| {
@@ -289,117 +505,398 @@ impl BM25 {
         results
     }
 
-    /// 获取所有文档的 BM25 分数
-    pub fn get_scores(&self, query: &str) -> Vec<f64> {
-        let mut scores = vec![0.0; self.corpus_size];
-        let query_tokens = self.tokenize(query);
-
-        for token in query_tokens {
-            if let Some(inv_list) = self.index.get(&token) {
-                // 计算 idf (注意：inv_list.doc_count 存储包含词 t 的文档总数 n(t))
-                let idf = self.calc_idf(inv_list.doc_count);
-
-                for block in &inv_list.blocks {
-                    for i in 0..block.doc_ids.len() {
-                        let doc_id = block.doc_ids[i] as usize;
-                        let freq = block.freqs[i];
-                        let doc_len = block.doc_lens[i];
-
-                        scores[doc_id] += self.calc_bm25_score(idf, freq, doc_len);
+    fn tokenize(&self, text: &str) -> Vec<String> {
+        JIEBA
+            .cut(text, false)
+            .into_iter()
+            .filter(|s| !s.trim().is_empty())
+            .map(|s| {
+                let mut token = s.to_string();
+                if self.lowercase {
+                    lower_in_place(&mut token);
+                }
+                token
+            })
+            .collect()
+    }
+
+    /// 查询分词 (带缓存)，重复的查询无需再次调用 jieba
+    fn tokenize_query(&self, query: &str) -> Arc<[String]> {
+        // 空白查询不会产生任何词，无需分词，也不占用缓存
+        if query.trim().is_empty() {
+            return Arc::from([]);
+        }
+        if let Some(tokens) = self
+            .query_cache
+            .read()
+            .ok()
+            .and_then(|cache| cache.get(query))
+        {
+            return tokens;
+        }
+        // 未命中时在锁外分词，只在写回时短暂持有写锁
+        let tokens: Arc<[String]> = self.tokenize(query).into();
+        if let Ok(mut cache) = self.query_cache.write() {
+            cache.insert(query, Arc::clone(&tokens));
+        }
+        tokens
+    }
+
+    /// 批量查询分词 (带缓存)：一次读锁查出所有命中项，未命中的查询在锁外并行分词，最后一次写锁写回
+    fn tokenize_queries(&self, queries: &[String]) -> Vec<Arc<[String]>> {
+        let mut tokens: Vec<Option<Arc<[String]>>> = {
+            let cache = self.query_cache.read().ok();
+            queries
+                .iter()
+                .map(|query| {
+                    if query.trim().is_empty() {
+                        Some(Arc::from([]))
+                    } else {
+                        cache.as_ref().and_then(|cache| cache.get(query))
                     }
+                })
+                .collect()
+        };
+
+        let missed: Vec<usize> = (0..queries.len())
+            .filter(|&i| tokens[i].is_none())
+            .collect();
+        if !missed.is_empty() {
+            let fresh: Vec<Arc<[String]>> = missed
+                .par_iter()
+                .map(|&i| self.tokenize(&queries[i]).into())
+                .collect();
+            if let Ok(mut cache) = self.query_cache.write() {
+                for (&i, query_tokens) in missed.iter().zip(&fresh) {
+                    cache.insert(&queries[i], Arc::clone(query_tokens));
                 }
             }
+            for (i, query_tokens) in missed.into_iter().zip(fresh) {
+                tokens[i] = Some(query_tokens);
+            }
         }
+
+        tokens
+            .into_iter()
+            .map(|query_tokens| query_tokens.unwrap_or_else(|| Arc::from([])))
+            .collect()
+    }
+
+    /// 并行计算一批查询的全量分数，返回按行连续存放的 (len(queries), 文档数) 分数矩阵
+    ///
+    /// 查询按线程数均分为若干组，每组写入矩阵中互不重叠的连续行，组内仍共享倒排列表的遍历
+    fn score_batch(&self, queries: &[String]) -> Vec<f64> {
+        let query_tokens = self.tokenize_queries(queries);
+        let mut scores = vec![0.0; queries.len() * self.corpus_size];
+        let group_len = queries.len().div_ceil(rayon::current_num_threads()).max(1);
+        scores
+            .par_chunks_mut((group_len * self.corpus_size).max(1))
+            .zip(query_tokens.par_chunks(group_len))
+            .for_each(|(rows, group)| self.score_queries(group, rows));
         scores
     }
 
-    /// 保存索引到文件 (MessagePack)
-    pub fn save(&self, path: &str) -> PyResult<()> {
-        let file = File::create(path)?;
-        let mut writer = BufWriter::new(file);
-        rmp_serde::encode::write(&mut writer, self)
-            .map_err(|e| PyErr::new::<pyo3::exceptions::PyIOError, _>(e.to_string()))?;
-        Ok(())
+    /// 对一批已分词的查询计算全量分数，累加到按行连续存放的 (len(queries), 文档数) 矩阵 scores 中
+    ///
+    /// 先按词项聚合 (query_id, qf)，使每个词的倒排列表在整批查询中只遍历一次
+    fn score_queries(&self, queries: &[Arc<[String]>], scores: &mut [f64]) {
+        // 按词项聚合，词项按词 ID 排序，保证累加顺序（浮点结果）与分组方式无关、与 search 一致
+        let mut term_slots: FxHashMap<u32, usize> = FxHashMap::default();
+        let mut term_queries: Vec<(u32, Vec<(usize, u32)>)> = Vec::new();
+        for (query_id, tokens) in queries.iter().enumerate() {
+            for token in tokens.iter() {
+                let Some(&term_id) = self.vocab.get(token.as_str()) else {
+                    continue;
+                };
+                let slot = *term_slots.entry(term_id).or_insert_with(|| {
+                    term_queries.push((term_id, Vec::new()));
+                    term_queries.len() - 1
+                });
+                let entries = &mut term_queries[slot].1;
+                match entries.last_mut() {
+                    Some((last_id, qf)) if *last_id == query_id => *qf += 1,
+                    _ => entries.push((query_id, 1)),
+                }
+            }
+        }
+
+        term_queries.sort_unstable_by_key(|&(term_id, _)| term_id);
+
+        let mut doc_ids = [0; BLOCK_SIZE];
+        for (term_id, entries) in term_queries {
+            let inv_list = &self.postings[term_id as usize];
+
+            for (block_idx, block) in inv_list.blocks.iter().enumerate() {
+                let n = inv_list.decode_block(block_idx, &mut doc_ids);
+
+                for &(query_id, qf) in &entries {
+                    let row = &mut scores[query_id * self.corpus_size..];
+                    for (&doc_id, &score) in doc_ids[..n].iter().zip(&block.impacts) {
+                        row[doc_id as usize] += qf as f64 * score as f64;
+                    }
+                }
+            }
+        }
     }
 
-    /// 从文件加载索引 (MessagePack)
-    #[staticmethod]
-    pub fn load(path: &str) -> PyResult<Self> {
-        let file = File::open(path)?;
-        let reader = BufReader::new(file);
-        let bm25: BM25 = rmp_serde::decode::from_read(reader)
-            .map_err(|e| PyErr::new::<pyo3::exceptions::PyIOError, _>(e.to_string()))?;
-        Ok(bm25)
+    /// 由按 doc_id 排序的 (doc_id, freq) 列表构建一个词的倒排列表
+    fn build_inverted_list(&self, postings: &[(u32, u32)]) -> InvertedList {
+        let mut inverted_list = InvertedList {
+            doc_count: postings.len(),
+            ..Default::default()
+        };
+
+        let mut prev_doc_id = 0;
+        for chunk in postings.chunks(BLOCK_SIZE) {
+            let mut block = Block {
+                last_doc_id: chunk.last().unwrap().0,
+                doc_id_deltas: Vec::with_capacity(chunk.len()),
+                freqs: Vec::with_capacity(chunk.len()),
+                impacts: Vec::new(),
+            };
+
+            for &(doc_id, freq) in chunk {
+                encode_varbyte(doc_id - prev_doc_id, &mut block.doc_id_deltas);
+                prev_doc_id = doc_id;
+                block.freqs.push(freq);
+            }
+            inverted_list.blocks.push(block);
+        }
+        self.build_impacts(&mut inverted_list);
+        inverted_list
     }
-}
 
-impl BM25 {
-    fn tokenize(&self, text: &str) -> Vec<String> {
-        JIEBA
-            .cut(text, false)
-            .into_iter()
-            .map(|s| {
-                if self.lowercase {
-                    s.to_lowercase()
-                } else {
-                    s.to_string()
+    /// 预计算倒排列表的词项权重、各文档得分 (impacts) 以及词级得分上界
+    fn build_impacts(&self, inv_list: &mut InvertedList) {
+        // IDF 按 inv_list.doc_count (包含词 t 的文档总数 n(t)) 计算，与同样固定的 (k1 + 1) 合并为一个系数
+        let idf = calc_idf(self.corpus_size, inv_list.doc_count);
+        inv_list.term_weight = idf * (self.k1 + 1.0);
+        inv_list.max_score = 0.0;
+
+        let mut doc_ids = [0; BLOCK_SIZE];
+        let mut block_scores = [0.0; BLOCK_SIZE];
+        for block_idx in 0..inv_list.blocks.len() {
+            let n = inv_list.decode_block(block_idx, &mut doc_ids);
+            let block = &mut inv_list.blocks[block_idx];
+            let weight = inv_list.term_weight;
+            self.score_block(weight, &doc_ids[..n], &block.freqs, &mut block_scores);
+            block.impacts = block_scores[..n].iter().map(|&s| s as f32).collect();
+            inv_list.max_score = block
+                .impacts
+                .iter()
+                .fold(inv_list.max_score, |m, &s| m.max(s as f64));
+        }
+    }
+
+    /// 一次计算整个倒排块 (已解码的文档ID与词频) 的 BM25 得分
+    fn score_block(
+        &self,
+        term_weight: f64,
+        doc_ids: &[u32],
+        freqs: &[u32],
+        out: &mut [f64; BLOCK_SIZE],
+    ) {
+        let n = doc_ids.len();
+        let mut norms = [0.0; BLOCK_SIZE];
+        self.fill_norm_buffer(doc_ids, &mut norms[..n]);
+        self.apply_bm25_block(term_weight, freqs, &norms[..n], &mut out[..n]);
+    }
+
+    /// 按 doc_id 计算长度归一化因子 k1 * (1 - b + b * dl / avgdl)
+    #[inline]
+    fn fill_norm_buffer(&self, doc_ids: &[u32], norms: &mut [f64]) {
+        let (k1, b, avgdl) = (self.k1, self.b, self.avgdl);
+        for (norm, &doc_id) in norms.iter_mut().zip(doc_ids) {
+            let doc_len = self.doc_lengths[doc_id as usize] as f64;
+            *norm = k1 * (1.0 - b + b * doc_len / avgdl);
+        }
+    }
+
+    /// 按词频与长度归一化因子计算一块得分
+    #[inline]
+    fn apply_bm25_block(&self, term_weight: f64, freqs: &[u32], norms: &[f64], out: &mut [f64]) {
+        bm25_block_kernel(term_weight, freqs, norms, out)
+    }
+
+    /// 统计查询词：每个词只查一次词典，之后按词 ID 合并重复词，结果按词 ID 排序
+    fn query_terms<'a>(&'a self, tokens: &[String]) -> Vec<QueryTerm<'a>> {
+        let mut terms: Vec<QueryTerm<'a>> = Vec::with_capacity(tokens.len());
+        for token in tokens {
+            let Some(&term_id) = self.vocab.get(token.as_str()) else {
+                continue;
+            };
+            match terms.iter_mut().find(|term| term.term_id == term_id) {
+                Some(term) => term.qf += 1.0,
+                None => {
+                    terms.push(QueryTerm {
+                        term_id,
+                        list: &self.postings[term_id as usize],
+                        qf: 1.0,
+                    });
                 }
-            })
-            .filter(|s| !s.trim().is_empty())
-            .collect()
+            }
+        }
+        terms.sort_unstable_by_key(|term| term.term_id);
+        terms
     }
 
-    fn calc_idf(&self, matched_docs: usize) -> f64 {
-        let numerator = self.corpus_size as f64 - matched_docs as f64 + 0.5;
-        let denominator = matched_docs as f64 + 0.5;
-        (numerator / denominator + 1.0).ln()
+    /// 重建不参与序列化的派生数据
+    fn build_caches(&mut self) {
+        let mut postings = std::mem::take(&mut self.postings);
+        postings
+            .par_iter_mut()
+            .for_each(|inv_list| self.build_impacts(inv_list));
+        self.postings = postings;
     }
+}
 
-    fn calc_bm25_score(&self, idf: f64, freq: u32, doc_len: u32) -> f64 {
-        let freq = freq as f64;
-        let numerator = freq * (self.k1 + 1.0);
-        let denominator = freq + self.k1 * (1.0 - self.b + self.b * doc_len as f64 / self.avgdl);
-        idf * numerator / denominator
+/// 块打分内核：只有算术运算，无分支、无函数指针，
+/// 编译器可将其自动向量化 (x86 上为 SSE/AVX，ARM 上为 NEON)
+#[inline]
+fn bm25_block_kernel(term_weight: f64, freqs: &[u32], norms: &[f64], out: &mut [f64]) {
+    for ((score, &freq), &norm) in out.iter_mut().zip(freqs).zip(norms) {
+        *score = calc_bm25_score(term_weight, freq, norm);
     }
 }
 
+/// 得分上界是否不足以超过阈值 (可以剪枝)
+///
+/// 上界与剪枝时的部分和按游标顺序累加，最终得分按词 ID 顺序累加，二者可能相差若干个 ulp。
+/// 因此对整个上界 (含部分和) 按相对系数放大后再比较，保证按最终得分能进入 Top-K 的文档不被剪掉
+#[inline]
+fn below_threshold(bound: f64, threshold: f64) -> bool {
+    bound * BOUND_SLACK <= threshold
+}
+
+/// 校验索引文件头 (魔数 + 格式版本)，返回其后的 MessagePack 数据
+fn strip_index_header(bytes: &[u8]) -> PyResult<&[u8]> {
+    let Some(rest) = bytes.strip_prefix(INDEX_MAGIC.as_slice()) else {
+        return Err(pyo3::exceptions::PyIOError::new_err(
+            "index was built by an older version of bm25-jieba (or is not an index file); \
+             re-fit it and save it again",
+        ));
+    };
+    let Some((version, payload)) = rest.split_first_chunk::<4>() else {
+        return Err(pyo3::exceptions::PyIOError::new_err(
+            "index file is truncated: missing format version",
+        ));
+    };
+    let version = u32::from_le_bytes(*version);
+    if version != INDEX_FORMAT_VERSION {
+        return Err(pyo3::exceptions::PyIOError::new_err(format!(
+            "index format version {version} is not supported by this version of bm25-jieba \
+             (expected {INDEX_FORMAT_VERSION}); re-fit it and save it again"
+        )));
+    }
+    Ok(payload)
+}
+
+/// 转小写：纯 ASCII 的词原地转换，不分配新字符串；含非 ASCII 字符时按 Unicode 规则转换
+fn lower_in_place(s: &mut String) {
+    if s.is_ascii() {
+        s.make_ascii_lowercase();
+    } else {
+        *s = s.to_lowercase();
+    }
+}
+
+/// varbyte 编码：每字节低 7 位存数据 (低位在前)，最高位表示后面还有字节
+fn encode_varbyte(mut value: u32, out: &mut Vec<u8>) {
+    while value >= 0x80 {
+        out.push((value as u8 & 0x7F) | 0x80);
+        value >>= 7;
+    }
+    out.push(value as u8);
+}
+
+/// 单个文档的 BM25 得分：term_weight * tf / (tf + 长度归一化因子)，term_weight = idf * (k1 + 1)
+#[inline]
+fn calc_bm25_score(term_weight: f64, freq: u32, doc_norm: f64) -> f64 {
+    let freq = freq as f64;
+    term_weight * freq / (freq + doc_norm)
+}
+
+fn calc_idf(corpus_size: usize, matched_docs: usize) -> f64 {
+    let numerator = corpus_size as f64 - matched_docs as f64 + 0.5;
+    let denominator = matched_docs as f64 + 0.5;
+    (numerator / denominator + 1.0).ln()
+}
+
+/// 查询词统计 (词 ID, 倒排列表, 查询词频)
+struct QueryTerm<'a> {
+    term_id: u32,
+    list: &'a InvertedList,
+    qf: f64,
+}
+
 /// 辅助游标，用于遍历倒排索引
+///
+/// 进入新块时整块解码文档ID，得分直接读取块内预计算的 impacts
 struct BlockCursor<'a> {
     list: &'a InvertedList,
     block_idx: usize,
     in_block_idx: usize,
-    idf: f64,
+    qf: f64,
+    slot: usize,                // 该词在查询词 (按词 ID 排序) 中的位置
+    block_len: usize,           // 当前块已解码的文档数 (越过最后一块后为 0)
+    doc_ids: [u32; BLOCK_SIZE], // 当前块解码后的文档ID
 }
 
 impl<'a> BlockCursor<'a> {
-    fn new(list: &'a InvertedList, idf: f64) -> Self {
-        BlockCursor {
+    fn new(list: &'a InvertedList, qf: f64, slot: usize) -> Self {
+        let mut cursor = BlockCursor {
             list,
             block_idx: 0,
             in_block_idx: 0,
-            idf,
-        }
+            qf,
+            slot,
+            block_len: 0,
+            doc_ids: [0; BLOCK_SIZE],
+        };
+        cursor.load_block();
+        cursor
+    }
+
+    /// 解码 block_idx 指向的块
+    fn load_block(&mut self) {
+        self.block_len = if self.block_idx < self.list.blocks.len() {
+            self.list.decode_block(self.block_idx, &mut self.doc_ids)
+        } else {
+            0
+        };
     }
 
     fn curr_doc_id(&self) -> Option<u32> {
-        if self.block_idx >= self.list.blocks.len() {
+        if self.in_block_idx >= self.block_len {
             return None;
         }
-        let block = &self.list.blocks[self.block_idx];
-        if self.in_block_idx >= block.doc_ids.len() {
-            return None;
-        }
-        Some(block.doc_ids[self.in_block_idx])
+        Some(self.doc_ids[self.in_block_idx])
+    }
+
+    /// 当前文档在该词上的得分 (已乘以查询词频)
+    fn curr_score(&self) -> f64 {
+        self.qf * self.list.blocks[self.block_idx].impacts[self.in_block_idx] as f64
     }
 
-    fn curr_score(&self, k1: f64, b: f64, avgdl: f64) -> f64 {
-        let block = &self.list.blocks[self.block_idx];
-        let freq = block.freqs[self.in_block_idx] as f64;
-        let doc_len = block.doc_lens[self.in_block_idx] as f64;
+    /// 该词对任意文档的得分上界
+    fn upper_bound(&self) -> f64 {
+        self.qf * self.list.max_score
+    }
 
-        let numerator = freq * (k1 + 1.0);
-        let denominator = freq + k1 * (1.0 - b + b * doc_len / avgdl);
-        self.idf * numerator / denominator
+    /// 前进到第一个 doc_id >= target 的位置，利用块的 last_doc_id 整块跳过
+    fn advance_to(&mut self, target: u32) {
+        let blocks = &self.list.blocks;
+        let start_block = self.block_idx;
+        while self.block_idx < blocks.len() && blocks[self.block_idx].last_doc_id < target {
+            self.block_idx += 1;
+            self.in_block_idx = 0;
+        }
+        // 只解码最终落入的块，被跳过的块无需解码
+        if self.block_idx != start_block {
+            self.load_block();
+        }
+        self.in_block_idx +=
+            self.doc_ids[self.in_block_idx..self.block_len].partition_point(|&d| d < target);
     }
 
     fn advance(&mut self) {
@@ -410,12 +907,10 @@ impl<'a> BlockCursor<'a> {
         self.in_block_idx += 1;
 
         // 如果当前块遍历完了，移动到下一个块
-        if self.in_block_idx >= self.list.blocks[self.block_idx].doc_ids.len() {
+        if self.in_block_idx >= self.block_len {
             self.block_idx += 1;
             self.in_block_idx = 0;
-
-            // TODO: 这里可以加入 Block 级剪枝逻辑
-            // if self.list.blocks[self.block_idx].max_score < threshold { skip }
+            self.load_block();
         }
     }
 }
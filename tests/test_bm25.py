@@ -2,9 +2,39 @@
 BM25 中文搜索测试
 """
 
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pytest
 from bm25_jieba import BM25
 
+# 合成语料库使用的词表：下标越小的词出现越频繁，使各词的文档频率与得分上界差异明显
+SYNTHETIC_WORDS = [
+    "alpha", "beta", "gamma", "delta", "epsilon", "zeta",
+    "eta", "theta", "iota", "kappa", "lambda", "omega",
+]
+
+
+def synthetic_corpus(size: int, seed: int = 42) -> list[str]:
+    """生成确定性的英文单词语料库 (长度与词频各不相同)"""
+    rng = random.Random(seed)
+    n = len(SYNTHETIC_WORDS)
+    return [
+        " ".join(
+            SYNTHETIC_WORDS[min(rng.randrange(n), rng.randrange(n))]
+            for _ in range(rng.randint(3, 30))
+        )
+        for _ in range(size)
+    ]
+
+
+def brute_force_top_k(scores: np.ndarray, k: int) -> list[int]:
+    """按分数降序 (同分时文档 ID 升序) 取前 k 个有分数的文档"""
+    matched = [i for i in range(len(scores)) if scores[i] > 0]
+    return sorted(matched, key=lambda i: (-scores[i], i))[:k]
+
 
 class TestBM25:
     """BM25 核心功能测试"""
@@ -85,11 +115,46 @@ class TestBM25:
         assert scores[2] == 0
         assert scores[3] == 0
 
+    def test_get_scores_returns_ndarray(self, bm25: BM25, sample_documents: list[str]):
+        """分数以 float64 NumPy 数组返回"""
+        scores = bm25.get_scores("Python")
+        assert isinstance(scores, np.ndarray)
+        assert scores.dtype == np.float64
+        assert scores.shape == (len(sample_documents),)
+
+        batch_scores = bm25.get_scores_batch(["Python", "机器学习"])
+        assert isinstance(batch_scores, np.ndarray)
+        assert batch_scores.shape == (2, len(sample_documents))
+
+    def test_search_batch(self, bm25: BM25):
+        """测试批量搜索与单次搜索结果一致"""
+        queries = ["Python", "机器学习", "区块链加密货币"]
+        batch_results = bm25.search_batch(queries, top_k=3)
+        assert len(batch_results) == len(queries)
+        for query, results in zip(queries, batch_results):
+            assert results == bm25.search(query, top_k=3)
+
+    def test_get_scores_batch(self, bm25: BM25, sample_documents: list[str]):
+        """测试批量获取分数与单次获取结果一致"""
+        queries = ["Python", "机器学习"]
+        batch_scores = bm25.get_scores_batch(queries)
+        assert len(batch_scores) == len(queries)
+        for query, scores in zip(queries, batch_scores):
+            assert len(scores) == len(sample_documents)
+            assert list(scores) == pytest.approx(list(bm25.get_scores(query)))
+
     def test_empty_query(self, bm25: BM25):
         """测试空查询"""
         results = bm25.search("")
         assert len(results) == 0
 
+    def test_whitespace_query(self, bm25: BM25, sample_documents: list[str]):
+        """测试仅含空白字符的查询"""
+        assert bm25.search("  \t\n ") == []
+        scores = bm25.get_scores("   ")
+        assert len(scores) == len(sample_documents)
+        assert all(score == 0 for score in scores)
+
     def test_empty_corpus(self):
         """测试空语料库"""
         bm25 = BM25()
@@ -97,6 +162,15 @@ class TestBM25:
         results = bm25.search("Python")
         assert len(results) == 0
 
+    def test_top_k_zero_and_unfitted(self, bm25: BM25):
+        """top_k 为 0 或索引未训练时直接返回空结果"""
+        assert bm25.search("Python", top_k=0) == []
+        assert bm25.search_batch(["Python", "机器学习"], top_k=0) == [[], []]
+
+        unfitted = BM25()
+        assert unfitted.search("Python") == []
+        assert unfitted.search_batch(["Python", "机器学习"]) == [[], []]
+
     def test_single_document(self):
         """测试单文档语料库"""
         bm25 = BM25()
@@ -119,6 +193,38 @@ class TestBM25:
         results_loaded = loaded_bm25.search("Python")
         assert results_orig == results_loaded
 
+    def test_load_rejects_old_format(self, bm25: BM25, tmp_path):
+        """没有文件头的旧版本索引或非索引文件，加载时给出明确错误"""
+        save_path = tmp_path / "bm25.bin"
+        bm25.save(str(save_path))
+        data = save_path.read_bytes()
+        assert data.startswith(b"BM25JIEB")
+
+        # 旧版本索引：只有 MessagePack 数据，没有文件头
+        old_path = tmp_path / "old.bin"
+        old_path.write_bytes(data[12:])
+        with pytest.raises(OSError, match="older version"):
+            BM25.load(str(old_path))
+
+        garbage_path = tmp_path / "garbage.bin"
+        garbage_path.write_bytes(b"not an index file")
+        with pytest.raises(OSError, match="older version"):
+            BM25.load(str(garbage_path))
+
+        # 格式版本不匹配
+        future_path = tmp_path / "future.bin"
+        future_path.write_bytes(data[:8] + (99).to_bytes(4, "little") + data[12:])
+        with pytest.raises(OSError, match="format version 99"):
+            BM25.load(str(future_path))
+
+    def test_concurrent_search(self, bm25: BM25):
+        """多线程共享同一实例查询，结果与单线程一致"""
+        queries = ["Python", "机器学习", "深度学习", "编程语言"] * 25
+        expected = [bm25.search(query, top_k=3) for query in queries]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda query: bm25.search(query, top_k=3), queries))
+        assert results == expected
+
 
 class TestBM25Scoring:
     """BM25 评分算法测试"""
@@ -153,6 +259,107 @@ class TestBM25Scoring:
         # 词频更高的文档分数更高（但受 k1 饱和限制）
         assert scores[1] > scores[0]
 
+    def test_long_document_exact_length(self):
+        """长文档按精确长度打分：长度相近的文档不并列，分数与公式一致"""
+        lengths = range(96, 104)
+        docs = [" ".join(["target"] + [f"w{i % 50}" for i in range(1, n)]) for n in lengths]
+        bm25 = BM25(k1=1.5, b=0.75)
+        bm25.fit(docs)
+        scores = bm25.get_scores("target")
+
+        avgdl = sum(lengths) / len(lengths)
+        idf = math.log(0.5 / (len(docs) + 0.5) + 1)
+        for score, n in zip(scores, lengths):
+            expected = idf * 2.5 / (1 + 1.5 * (1 - 0.75 + 0.75 * n / avgdl))
+            assert score == pytest.approx(expected, rel=1e-6)  # 得分以 f32 存储
+        assert all(a > b for a, b in zip(scores, scores[1:]))
+
+
+class TestBM25MaxScore:
+    """MaxScore 剪枝结果与全量打分一致性测试
+
+    语料足够大，使堆被填满后仍有大量候选文档：高频词会被移入非必要词，
+    倒排列表跨越多个 128 文档的块，advance_to 需要整块跳过
+    """
+
+    @pytest.fixture(scope="class")
+    def bm25(self) -> BM25:
+        model = BM25()
+        model.fit(synthetic_corpus(3000))
+        return model
+
+    @pytest.mark.parametrize("k", [1, 10, 100])
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "alpha",
+            "alpha omega",
+            "beta kappa lambda",
+            "omega omega alpha",
+            "alpha beta gamma delta epsilon",
+            "lambda iota lambda theta alpha",
+        ],
+    )
+    def test_search_matches_brute_force(self, bm25: BM25, query: str, k: int):
+        """search 的 Top-K 与 get_scores 全量排序的前 k 个完全一致 (含同分时的顺序)"""
+        scores = bm25.get_scores(query)
+        expected = brute_force_top_k(scores, k)
+        results = bm25.search(query, top_k=k)
+
+        assert [doc_id for doc_id, _ in results] == expected
+        assert [score for _, score in results] == [scores[i] for i in expected]
+
+    def test_batch_scores_identical(self, bm25: BM25):
+        """批量打分按词 ID 顺序累加，与逐条 get_scores 逐位相同"""
+        queries = ["omega alpha", "alpha omega", "beta kappa lambda", "kappa beta"]
+        batch = bm25.get_scores_batch(queries)
+        for row, query in zip(batch, queries):
+            assert np.array_equal(row, bm25.get_scores(query))
+
+
+class TestBM25SaveLoad:
+    """多块、大间隔倒排列表的保存与加载测试"""
+
+    CORPUS_SIZE = 20000
+    ID_OFFSET = 10**12
+
+    @pytest.fixture(scope="class")
+    def bm25(self) -> BM25:
+        docs = []
+        for i in range(self.CORPUS_SIZE):
+            words = [f"filler{i % 10}"] + ["pad"] * (i % 5)
+            if i % 2 == 0:
+                words.append("common")  # 10000 篇文档，跨越多个块
+            if i % 150 == 0:
+                words.append("sparse")  # 间隔 150，增量需 2 字节变长编码
+            if i in (5, 17005, 19999):
+                words.append("rare")  # 间隔 17000，增量需 3 字节变长编码
+            docs.append(" ".join(words))
+        model = BM25()
+        model.fit(docs, [self.ID_OFFSET + i for i in range(self.CORPUS_SIZE)])
+        return model
+
+    def test_save_load_identical(self, bm25: BM25, tmp_path):
+        """保存并加载后 get_scores 与 search 结果完全相同"""
+        save_path = tmp_path / "bm25.bin"
+        bm25.save(str(save_path))
+        loaded = BM25.load(str(save_path))
+
+        queries = ["common", "sparse", "rare", "rare sparse common", "filler3 pad common"]
+        for query in queries:
+            assert np.array_equal(loaded.get_scores(query), bm25.get_scores(query))
+            for k in (1, 10, 1000):
+                assert loaded.search(query, top_k=k) == bm25.search(query, top_k=k)
+        assert np.array_equal(loaded.get_scores_batch(queries), bm25.get_scores_batch(queries))
+
+        # 跨块、大间隔的文档 ID 解码正确
+        rare = {doc_id for doc_id, _ in loaded.search("rare", top_k=10)}
+        assert rare == {self.ID_OFFSET + i for i in (5, 17005, 19999)}
+        sparse = {doc_id for doc_id, _ in loaded.search("sparse", top_k=1000)}
+        assert sparse == {self.ID_OFFSET + i for i in range(0, self.CORPUS_SIZE, 150)}
+        common = loaded.get_scores("common")
+        assert np.array_equal(np.nonzero(common)[0], np.arange(0, self.CORPUS_SIZE, 2))
+
 
 class TestBM25CaseInsensitive:
     """BM25 大小写不敏感测试"""
@@ -200,3 +407,51 @@ class TestBM25CaseInsensitive:
         results = bm25.search("机器学习ai")
         assert len(results) > 0
         assert results[0][0] == 1
+
+    def test_non_ascii_lowercase(self):
+        """测试非 ASCII 字母的大小写处理"""
+        bm25 = BM25(lowercase=True)
+        docs = ["ÜBER München", "Straße Berlin"]
+        bm25.fit(docs)
+
+        results = bm25.search("über")
+        assert len(results) > 0
+        assert results[0][0] == 0
+
+
+class TestBM25QueryCache:
+    """查询分词缓存测试"""
+
+    @pytest.fixture
+    def bm25(self) -> BM25:
+        model = BM25(lowercase=True)
+        model.fit([doc.title() for doc in synthetic_corpus(500)])
+        return model
+
+    def test_repeated_query_lowercase(self, bm25: BM25):
+        """重复查询命中缓存后结果不变，大小写不同的查询结果相同"""
+        first = bm25.search("ALPHA Omega", top_k=20)
+        scores = bm25.get_scores("ALPHA Omega")
+        assert len(first) > 0
+
+        for _ in range(3):
+            assert bm25.search("ALPHA Omega", top_k=20) == first
+            assert np.array_equal(bm25.get_scores("ALPHA Omega"), scores)
+        assert bm25.search("alpha omega", top_k=20) == first
+        assert bm25.search_batch(["ALPHA Omega", "alpha OMEGA"], top_k=20) == [first, first]
+
+    def test_cache_eviction(self, bm25: BM25):
+        """不同查询数超过缓存容量 (4096) 导致淘汰后，结果依然正确"""
+        queries = [
+            f"{SYNTHETIC_WORDS[i % 12].upper()} {SYNTHETIC_WORDS[i % 7]} Q{i}"
+            for i in range(5000)
+        ]
+        expected = [bm25.search(query, top_k=5) for query in queries[:50]]
+
+        batch = bm25.search_batch(queries, top_k=5)
+        assert batch[:50] == expected
+
+        # 最早的查询已被淘汰，重新分词后结果不变
+        assert [bm25.search(query, top_k=5) for query in queries[:50]] == expected
+        for i in range(0, 5000, 250):
+            assert batch[i] == bm25.search(queries[i], top_k=5)